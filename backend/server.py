@@ -1,17 +1,23 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Header
-from fastapi.responses import StreamingResponse, Response
+from fastapi.responses import StreamingResponse, Response, ORJSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, ReplaceOne, DeleteOne
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator
 import uuid
+import asyncio
 from datetime import datetime, timezone
 from enum import Enum
 import json
+import orjson
+import hashlib
+import functools
+import re
 import httpx
 
 ROOT_DIR = Path(__file__).parent
@@ -19,11 +25,23 @@ load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=50,
+    minPoolSize=10,
+    serverSelectionTimeoutMS=2000,
+    waitQueueTimeoutMS=500
+)
 db = client[os.environ['DB_NAME']]
 
+# LLM response cache lifetime (0 disables the cache)
+LLM_CACHE_TTL_SECONDS = int(os.environ.get('LLM_CACHE_TTL_SECONDS', '3600'))
+
+# Most recent conversation turns kept on each project document
+MAX_CONVERSATION_HISTORY = 200
+
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -46,6 +64,9 @@ class ProjectStage(str, Enum):
     EXPLANATION = "explanation"
     ITERATION = "iteration"
 
+STAGE_ORDER = [stage.value for stage in ProjectStage]
+STAGE_INDEX = {name: i for i, name in enumerate(STAGE_ORDER)}
+
 class ProjectStatus(str, Enum):
     ACTIVE = "active"
     ARCHIVED = "archived"
@@ -101,6 +122,9 @@ class ProjectUpdate(BaseModel):
     status: Optional[ProjectStatus] = None
     selected_components: Optional[List[str]] = None
 
+class BulkDeleteRequest(BaseModel):
+    ids: List[str]
+
 class StageApproval(BaseModel):
     stage: ProjectStage
     approved: bool
@@ -113,6 +137,8 @@ class LLMRequest(BaseModel):
     provider: LLMProvider = LLMProvider.OPENAI
     model: Optional[str] = None
     api_key: Optional[str] = None
+    use_cache: bool = False  # opt in; regenerating must produce fresh output
+    stream: bool = False
 
 class ShoppingListRequest(BaseModel):
     component_ids: List[str]
@@ -127,6 +153,7 @@ class DebugRequest(BaseModel):
     provider: LLMProvider = LLMProvider.OPENAI
     model: Optional[str] = None
     api_key: Optional[str] = None
+    use_cache: bool = False  # opt in; re-analyzing a log must produce fresh output
 
 # ================== ESP32 PIN MAPPING ==================
 
@@ -594,53 +621,136 @@ HARDWARE_LIBRARY = {
     ]
 }
 
+PRICE_PATTERN = re.compile(r"\$?(\d+(?:\.\d+)?)(?:\s*-\s*\$?(\d+(?:\.\d+)?))?")
+
+def _parse_price(price_str: str) -> tuple:
+    """Parse a "$min-max" price estimate into a (min, max) tuple"""
+    match = PRICE_PATTERN.search(price_str)
+    if not match:
+        return 0.0, 0.0
+    min_price = float(match.group(1))
+    max_price = float(match.group(2)) if match.group(2) else min_price
+    return min_price, max_price
+
+# Flattened component index and parsed prices, built once at import
+COMPONENTS_BY_ID = {c["id"]: c for category in HARDWARE_LIBRARY.values() for c in category}
+_PRICE_CACHE = {cid: _parse_price(c.get("price_estimate", "$0")) for cid, c in COMPONENTS_BY_ID.items()}
+
+# The library is static, so the /hardware response body is serialized once
+HARDWARE_LIBRARY_BYTES = orjson.dumps(HARDWARE_LIBRARY)
+
 # ================== LLM PROVIDERS ==================
 
+# Shared client so provider connections (TLS, HTTP/2) are reused across calls
+LLM_HTTP = httpx.AsyncClient(
+    http2=True,
+    timeout=120.0,
+    limits=httpx.Limits(max_keepalive_connections=20, max_connections=50)
+)
+
+async def stream_chat_completion(
+    provider_name: str,
+    url: str,
+    headers: Dict[str, str],
+    messages: List[dict],
+    model: str
+) -> AsyncIterator[str]:
+    """Stream content deltas from an OpenAI-compatible chat completions endpoint"""
+    async with LLM_HTTP.stream(
+        "POST",
+        url,
+        headers=headers,
+        content=orjson.dumps({
+            "model": model,
+            "messages": messages,
+            "max_tokens": 4096,
+            "temperature": 0.7,
+            "stream": True
+        })
+    ) as response:
+        if response.status_code != 200:
+            await response.aread()
+            raise HTTPException(status_code=response.status_code, detail=f"{provider_name} API error: {response.text}")
+        finished = False
+        async for line in response.aiter_lines():
+            # Skip keep-alive comments and blank separators between events
+            if not line.startswith("data: "):
+                continue
+            data = line[len("data: "):]
+            if data == "[DONE]":
+                finished = True
+                break
+            event = orjson.loads(data)
+            # Failures after the 200 arrive in-band; never pass partial text off as a full reply
+            if event.get("error"):
+                raise HTTPException(status_code=502, detail=f"{provider_name} API error: {event['error']}")
+            choices = event.get("choices")
+            if not choices:
+                continue
+            finish_reason = choices[0].get("finish_reason")
+            if finish_reason == "error":
+                raise HTTPException(status_code=502, detail=f"{provider_name} API error: generation failed mid-stream")
+            if finish_reason:
+                finished = True
+            delta = choices[0].get("delta", {}).get("content")
+            if delta:
+                yield delta
+        if not finished:
+            raise HTTPException(status_code=502, detail=f"{provider_name} API error: stream ended before completion")
+
+async def collect_stream(chunks: AsyncIterator[str]) -> str:
+    """Buffer a streamed response into a single string"""
+    return "".join([chunk async for chunk in chunks])
+
+def stream_groq_api(messages: List[dict], model: str, api_key: str) -> AsyncIterator[str]:
+    """Stream from Groq API directly"""
+    return stream_chat_completion(
+        "Groq",
+        "https://api.groq.com/openai/v1/chat/completions",
+        {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        },
+        messages,
+        model
+    )
+
 async def call_groq_api(messages: List[dict], model: str, api_key: str) -> str:
     """Call Groq API directly"""
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            "https://api.groq.com/openai/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": model,
-                "messages": messages,
-                "max_tokens": 4096,
-                "temperature": 0.7
-            },
-            timeout=120.0
-        )
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail=f"Groq API error: {response.text}")
-        data = response.json()
-        return data["choices"][0]["message"]["content"]
+    return await collect_stream(stream_groq_api(messages, model, api_key))
+
+def with_prompt_cache_breakpoint(messages: List[dict]) -> List[dict]:
+    """Mark everything before the final message as a cacheable prefix (Anthropic format)"""
+    if len(messages) < 2:
+        return messages
+    prefix = [dict(m) for m in messages[:-1]]
+    prefix[-1]["content"] = [{
+        "type": "text",
+        "text": prefix[-1]["content"],
+        "cache_control": {"type": "ephemeral"}
+    }]
+    return prefix + messages[-1:]
+
+def stream_openrouter_api(messages: List[dict], model: str, api_key: str) -> AsyncIterator[str]:
+    """Stream from OpenRouter API"""
+    if model.startswith("anthropic/"):
+        messages = with_prompt_cache_breakpoint(messages)
+    return stream_chat_completion(
+        "OpenRouter",
+        "https://openrouter.ai/api/v1/chat/completions",
+        {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "https://esp32-copilot.app",
+            "X-Title": "ESP32 IoT Copilot"
+        },
+        messages,
+        model
+    )
 
 async def call_openrouter_api(messages: List[dict], model: str, api_key: str) -> str:
     """Call OpenRouter API"""
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-                "HTTP-Referer": "https://esp32-copilot.app",
-                "X-Title": "ESP32 IoT Copilot"
-            },
-            json={
-                "model": model,
-                "messages": messages,
-                "max_tokens": 4096,
-                "temperature": 0.7
-            },
-            timeout=120.0
-        )
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail=f"OpenRouter API error: {response.text}")
-        data = response.json()
-        return data["choices"][0]["message"]["content"]
+    return await collect_stream(stream_openrouter_api(messages, model, api_key))
 
 async def call_emergent_api(messages: List[dict], model: str = "gpt-4o") -> str:
     """Call OpenAI via Emergent integration"""
@@ -664,10 +774,48 @@ async def call_emergent_api(messages: List[dict], model: str = "gpt-4o") -> str:
     response = await chat.send_message(user_msg)
     return response
 
+async def stream_emergent_api(messages: List[dict], model: str = "gpt-4o") -> AsyncIterator[str]:
+    """Emergent integration has no streaming mode, so the full response is one chunk"""
+    yield await call_emergent_api(messages, model)
+
+# ================== LLM RESPONSE CACHE ==================
+
+def llm_cache_key(provider: LLMProvider, model: str, messages: List[dict]) -> str:
+    """Exact-match cache key for a provider, model and prompt"""
+    payload = orjson.dumps([provider.value, model, messages], option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(payload).hexdigest()
+
+async def get_cached_llm_response(key: str) -> Optional[str]:
+    """Return a previously generated response for this prompt, if still cached"""
+    if LLM_CACHE_TTL_SECONDS <= 0:
+        return None
+    # The cache is only an optimization; a lookup failure just means a fresh generation
+    try:
+        cached = await db.llm_cache.find_one({"_id": key}, {"content": 1})
+    except Exception as e:
+        logger.warning(f"LLM cache lookup failed: {str(e)}")
+        return None
+    return cached["content"] if cached else None
+
+async def set_cached_llm_response(key: str, content: str) -> None:
+    """Store a generated response; expired entries are removed by the TTL index"""
+    if LLM_CACHE_TTL_SECONDS <= 0 or not content:
+        return
+    # Never fail a request whose generation already succeeded over a cache write
+    try:
+        await db.llm_cache.update_one(
+            {"_id": key},
+            {"$set": {"content": content, "created_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+    except Exception as e:
+        logger.warning(f"LLM cache write failed: {str(e)}")
+
 # ================== LLM HELPER ==================
 
-def get_system_prompt(stage: ProjectStage, hardware_library: dict) -> str:
-    """Get system prompt for each stage"""
+@functools.lru_cache(maxsize=16)
+def get_system_prompt(stage: ProjectStage) -> str:
+    """Get system prompt for each stage (memoized, the hardware library is static)"""
     system_prompts = {
         ProjectStage.REQUIREMENTS: """You are an ESP32 IoT project expert. Analyze the user's project idea and extract clear, structured requirements.
 Output format:
@@ -691,7 +839,7 @@ Be specific to ESP32 capabilities. Keep it practical and achievable.""",
         ProjectStage.HARDWARE: f"""You are an ESP32 hardware expert. Based on the project requirements, recommend specific hardware components and provide wiring guidance.
 
 Available hardware library:
-{json.dumps(hardware_library, indent=2)}
+{json.dumps(HARDWARE_LIBRARY, indent=2)}
 
 Output format:
 ## Recommended Components
@@ -797,17 +945,18 @@ Be specific and provide code snippets where helpful. Consider:
     
     return system_prompts.get(stage, "You are an ESP32 IoT expert assistant.")
 
-async def generate_llm_response(
+async def stream_llm_response(
     project: dict, 
     stage: ProjectStage, 
     user_message: Optional[str] = None,
     provider: LLMProvider = LLMProvider.OPENAI,
     model: Optional[str] = None,
-    api_key: Optional[str] = None
-) -> str:
-    """Generate LLM response for a specific stage"""
+    api_key: Optional[str] = None,
+    use_cache: bool = False
+) -> AsyncIterator[str]:
+    """Stream LLM response chunks for a specific stage"""
     
-    system_message = get_system_prompt(stage, HARDWARE_LIBRARY)
+    system_message = get_system_prompt(stage)
     
     # Build context from project
     context_parts = [f"Project: {project['name']}", f"Idea: {project['idea']}"]
@@ -818,43 +967,112 @@ async def generate_llm_response(
     context_parts.append(f"Target Hardware: {project['target_hardware']}")
     
     # Add previous stage outputs
-    stages_order = ["idea", "requirements", "hardware", "architecture", "code", "explanation"]
-    stage_idx = stages_order.index(stage.value) if stage.value in stages_order else 0
+    # Iteration works from user feedback and doesn't replay earlier stages
+    stage_idx = STAGE_INDEX.get(stage.value, 0) if stage != ProjectStage.ITERATION else 0
     
-    for prev_stage in stages_order[:stage_idx]:
+    for prev_stage in STAGE_ORDER[:stage_idx]:
         stage_data = project.get('stages', {}).get(prev_stage, {})
         if stage_data.get('content'):
             context_parts.append(f"\n=== {prev_stage.upper()} ===\n{stage_data['content']}")
     
     context = "\n".join(context_parts)
     
-    # Build user message
+    # Build user request
     if user_message:
-        full_message = f"Project Context:\n{context}\n\nUser Request: {user_message}"
+        request_message = f"User Request: {user_message}"
     else:
-        full_message = f"Project Context:\n{context}\n\nPlease generate the {stage.value} for this project."
+        request_message = f"Please generate the {stage.value} for this project."
     
+    # Keep the stable system prompt and project context ahead of the request so
+    # providers with prefix caching can reuse them across generations
     messages = [
         {"role": "system", "content": system_message},
-        {"role": "user", "content": full_message}
+        {"role": "user", "content": f"Project Context:\n{context}"},
+        {"role": "user", "content": request_message}
     ]
     
-    # Route to appropriate provider
+    # Resolve provider defaults first so the cache key reflects the actual model
     if provider == LLMProvider.GROQ:
         if not api_key:
             raise HTTPException(status_code=400, detail="Groq API key required")
         model = model or "llama-3.1-70b-versatile"
-        return await call_groq_api(messages, model, api_key)
-    
     elif provider == LLMProvider.OPENROUTER:
         if not api_key:
             raise HTTPException(status_code=400, detail="OpenRouter API key required")
         model = model or "anthropic/claude-3.5-sonnet"
-        return await call_openrouter_api(messages, model, api_key)
+    else:
+        model = model or "gpt-4o"
+    
+    cache_key = llm_cache_key(provider, model, messages)
+    if use_cache:
+        cached = await get_cached_llm_response(cache_key)
+        if cached is not None:
+            yield cached
+            return
     
+    # Route to appropriate provider
+    if provider == LLMProvider.GROQ:
+        chunks = stream_groq_api(messages, model, api_key)
+    elif provider == LLMProvider.OPENROUTER:
+        chunks = stream_openrouter_api(messages, model, api_key)
     else:  # Default to OpenAI via Emergent
-        model = model or "gpt-4o"
-        return await call_emergent_api(messages, model)
+        chunks = stream_emergent_api(messages, model)
+    
+    parts = []
+    async for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    
+    if use_cache:
+        await set_cached_llm_response(cache_key, "".join(parts))
+
+async def generate_llm_response(
+    project: dict, 
+    stage: ProjectStage, 
+    user_message: Optional[str] = None,
+    provider: LLMProvider = LLMProvider.OPENAI,
+    model: Optional[str] = None,
+    api_key: Optional[str] = None,
+    use_cache: bool = False
+) -> str:
+    """Generate LLM response for a specific stage"""
+    return await collect_stream(
+        stream_llm_response(project, stage, user_message, provider, model, api_key, use_cache)
+    )
+
+# ================== PROJECT STORAGE ==================
+
+def project_to_doc(project: Project) -> dict:
+    """Serialize a project for storage, using its id as the Mongo _id"""
+    # Unset optional fields are left out; readers fall back to the model defaults
+    doc = project.model_dump(mode="json", exclude_none=True)
+    doc["_id"] = doc.pop("id")
+    return doc
+
+def doc_to_project(doc: Optional[dict]) -> Optional[dict]:
+    """Expose a stored project's _id as its public id"""
+    if doc is None or "_id" not in doc:
+        return doc
+    return {"id": doc.pop("_id"), **doc}
+
+async def migrate_project_ids():
+    """Re-key projects stored before ids were kept in _id"""
+    # The old unique index would reject re-keyed documents, which have no id field
+    if "id_1" in await db.projects.index_information():
+        await db.projects.drop_index("id_1")
+    
+    # Each re-key is an upsert plus a delete; send them in ordered batches
+    operations = []
+    async for doc in db.projects.find({"id": {"$exists": True}}):
+        legacy_id = doc.pop("_id")
+        doc["_id"] = doc.pop("id")
+        operations.append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
+        operations.append(DeleteOne({"_id": legacy_id}))
+        if len(operations) >= 500:
+            await db.projects.bulk_write(operations)
+            operations = []
+    if operations:
+        await db.projects.bulk_write(operations)
 
 # ================== ROUTES ==================
 
@@ -881,86 +1099,101 @@ async def create_project(input: ProjectCreate):
         user_approved=True
     )
     
-    doc = project.model_dump()
-    await db.projects.insert_one(doc)
+    await db.projects.insert_one(project_to_doc(project))
     return project
 
-@api_router.get("/projects", response_model=List[Project])
+# History isn't loaded for the list, so leave it out rather than report it as empty
+@api_router.get("/projects", response_model=List[Project], response_model_exclude={"__all__": {"conversation_history"}})
 async def list_projects(status: Optional[ProjectStatus] = None):
     query = {}
     if status:
         query["status"] = status.value
     
-    projects = await db.projects.find(query, {"_id": 0}).sort("updated_at", -1).to_list(100)
-    return projects
+    # Project cards never show conversation history, so leave it in the database
+    projects = await db.projects.aggregate([
+        {"$match": query},
+        {"$sort": {"updated_at": -1}},
+        {"$limit": 100},
+        {"$project": {"conversation_history": 0}}
+    ]).to_list(100)
+    return [doc_to_project(p) for p in projects]
 
 @api_router.get("/projects/{project_id}", response_model=Project)
 async def get_project(project_id: str):
-    project = await db.projects.find_one({"id": project_id}, {"_id": 0})
+    project = await db.projects.find_one({"_id": project_id})
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    return project
+    return doc_to_project(project)
 
 @api_router.patch("/projects/{project_id}", response_model=Project)
 async def update_project(project_id: str, update: ProjectUpdate):
-    update_data = {k: v for k, v in update.model_dump().items() if v is not None}
+    update_data = update.model_dump(mode="json", exclude_none=True)
     if update_data:
         update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
-        await db.projects.update_one({"id": project_id}, {"$set": update_data})
+        project = await db.projects.find_one_and_update(
+            {"_id": project_id},
+            {"$set": update_data},
+            return_document=ReturnDocument.AFTER
+        )
+    else:
+        project = await db.projects.find_one({"_id": project_id})
     
-    project = await db.projects.find_one({"id": project_id}, {"_id": 0})
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    return project
+    return doc_to_project(project)
 
 @api_router.delete("/projects/{project_id}")
 async def delete_project(project_id: str):
-    result = await db.projects.delete_one({"id": project_id})
+    result = await db.projects.delete_one({"_id": project_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Project not found")
     return {"message": "Project deleted"}
 
+@api_router.post("/projects/bulk-delete")
+async def bulk_delete_projects(request: BulkDeleteRequest):
+    """Delete several projects in a single query"""
+    result = await db.projects.delete_many({"_id": {"$in": request.ids}})
+    return {"message": "Projects deleted", "deleted_count": result.deleted_count}
+
 # Stage Management
 @api_router.post("/projects/{project_id}/stages/{stage}/approve")
 async def approve_stage(project_id: str, stage: ProjectStage, approval: StageApproval):
-    project = await db.projects.find_one({"id": project_id}, {"_id": 0})
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    stages = project.get("stages", {})
-    stage_data = stages.get(stage.value, {})
-    stage_data["user_approved"] = approval.approved
-    if approval.notes:
-        stage_data["notes"] = approval.notes
-    
-    stages[stage.value] = stage_data
-    
     # Move to next stage if approved
     next_stage = None
     if approval.approved:
-        stage_order = ["idea", "requirements", "hardware", "architecture", "code", "explanation", "iteration"]
-        current_idx = stage_order.index(stage.value)
-        if current_idx < len(stage_order) - 1:
-            next_stage = stage_order[current_idx + 1]
+        current_idx = STAGE_INDEX[stage.value]
+        if current_idx < len(STAGE_ORDER) - 1:
+            next_stage = STAGE_ORDER[current_idx + 1]
     
+    # Only touch the approved stage's fields instead of rewriting all stages
     update_data = {
-        "stages": stages,
+        f"stages.{stage.value}.user_approved": approval.approved,
         "updated_at": datetime.now(timezone.utc).isoformat()
     }
+    if approval.notes:
+        update_data[f"stages.{stage.value}.notes"] = approval.notes
     if next_stage:
         update_data["current_stage"] = next_stage
     
-    await db.projects.update_one({"id": project_id}, {"$set": update_data})
+    result = await db.projects.update_one({"_id": project_id}, {"$set": update_data})
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Project not found")
     
     return {"message": "Stage approval updated", "next_stage": next_stage}
 
 # LLM Generation
 @api_router.post("/projects/{project_id}/generate")
 async def generate_stage_content(project_id: str, request: LLMRequest):
-    project = await db.projects.find_one({"id": project_id}, {"_id": 0})
+    project = doc_to_project(await db.projects.find_one(
+        {"_id": project_id},
+        {"name": 1, "idea": 1, "description": 1, "target_hardware": 1, "stages": 1}
+    ))
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
+    if request.stream:
+        return await stream_stage_content(project_id, project, request)
+    
     try:
         content = await generate_llm_response(
             project, 
@@ -968,32 +1201,12 @@ async def generate_stage_content(project_id: str, request: LLMRequest):
             request.user_message,
             request.provider,
             request.model,
-            request.api_key
+            request.api_key,
+            request.use_cache
         )
         
-        # Update project with generated content
-        stages = project.get("stages", {})
-        stages[request.stage.value] = {
-            "content": content,
-            "generated_at": datetime.now(timezone.utc).isoformat(),
-            "user_approved": False,
-            "notes": None
-        }
-        
-        # Add to conversation history
-        conversation = project.get("conversation_history", [])
-        if request.user_message:
-            conversation.append({"role": "user", "content": request.user_message, "stage": request.stage.value})
-        conversation.append({"role": "assistant", "content": content, "stage": request.stage.value})
-        
-        await db.projects.update_one(
-            {"id": project_id},
-            {"$set": {
-                "stages": stages,
-                "conversation_history": conversation,
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            }}
-        )
+        # Saved before responding so a follow-up approve or GET sees the new content
+        await save_stage_content(project_id, request.stage, content, request.user_message)
         
         return {"content": content, "stage": request.stage.value}
     
@@ -1001,31 +1214,111 @@ async def generate_stage_content(project_id: str, request: LLMRequest):
         logger.error(f"LLM generation error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 
+def sse_event(event: str, data: dict) -> bytes:
+    """Encode one server-sent event"""
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+async def stream_stage_content(project_id: str, project: dict, request: LLMRequest) -> StreamingResponse:
+    """Stream generated text as server-sent events, then persist it once complete
+    
+    Each chunk is a "chunk" event. The stream always ends with either a "done" event,
+    sent once the content is saved, or an "error" event, because a failure after the
+    200 has been sent can't change the status code.
+    """
+    chunks = stream_llm_response(
+        project, 
+        request.stage, 
+        request.user_message,
+        request.provider,
+        request.model,
+        request.api_key,
+        request.use_cache
+    )
+    
+    # Pull the first chunk before responding so provider errors still map to an HTTP error
+    try:
+        first_chunk = await anext(chunks, "")
+    except Exception as e:
+        logger.error(f"LLM generation error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
+    
+    async def body():
+        parts = [first_chunk]
+        yield sse_event("chunk", {"content": first_chunk})
+        try:
+            async for chunk in chunks:
+                parts.append(chunk)
+                yield sse_event("chunk", {"content": chunk})
+        except Exception as e:
+            logger.error(f"LLM streaming error: {str(e)}")
+            yield sse_event("error", {"detail": f"Generation failed: {str(e)}"})
+            return
+        try:
+            await save_stage_content(project_id, request.stage, "".join(parts), request.user_message)
+        except Exception as e:
+            logger.error(f"Failed to save {request.stage.value} content for project {project_id}: {str(e)}")
+            yield sse_event("error", {"detail": f"Generated content could not be saved: {str(e)}"})
+            return
+        yield sse_event("done", {"stage": request.stage.value})
+    
+    return StreamingResponse(body(), media_type="text/event-stream")
+
+async def save_stage_content(
+    project_id: str,
+    stage: ProjectStage,
+    content: str,
+    user_message: Optional[str] = None
+) -> None:
+    """Store generated stage content and append the exchange to conversation history"""
+    # Update only the generated stage and append to conversation history
+    now = datetime.now(timezone.utc).isoformat()
+    stage_data = {
+        "content": content,
+        "generated_at": now,
+        "user_approved": False,
+        "notes": None
+    }
+    
+    new_messages = []
+    if user_message:
+        new_messages.append({"role": "user", "content": user_message, "stage": stage.value})
+    new_messages.append({"role": "assistant", "content": content, "stage": stage.value})
+    
+    await db.projects.update_one(
+        {"_id": project_id},
+        {
+            "$set": {
+                f"stages.{stage.value}": stage_data,
+                "updated_at": now
+            },
+            "$push": {"conversation_history": {
+                "$each": new_messages,
+                "$slice": -MAX_CONVERSATION_HISTORY
+            }}
+        }
+    )
+
 # Hardware Library
 @api_router.get("/hardware")
 async def get_hardware_library():
-    return HARDWARE_LIBRARY
+    return Response(
+        content=HARDWARE_LIBRARY_BYTES,
+        media_type="application/json",
+        headers={"Cache-Control": "public, max-age=86400"}
+    )
 
 # Shopping List Generator
 @api_router.post("/shopping-list")
 async def generate_shopping_list(request: ShoppingListRequest):
     """Generate a shopping list with links for selected components"""
-    all_components = []
-    for category in HARDWARE_LIBRARY.values():
-        all_components.extend(category)
-    
     selected = []
     total_min = 0
     total_max = 0
     
     for comp_id in request.component_ids:
-        component = next((c for c in all_components if c["id"] == comp_id), None)
+        component = COMPONENTS_BY_ID.get(comp_id)
         if component:
-            # Parse price estimate
-            price_str = component.get("price_estimate", "$0")
-            prices = price_str.replace("$", "").split("-")
-            min_price = float(prices[0]) if prices[0] else 0
-            max_price = float(prices[1]) if len(prices) > 1 else min_price
+            min_price, max_price = _PRICE_CACHE[comp_id]
             
             selected.append({
                 "id": component["id"],
@@ -1048,7 +1341,20 @@ async def generate_shopping_list(request: ShoppingListRequest):
 @api_router.get("/projects/{project_id}/export/markdown")
 async def export_project_markdown(project_id: str):
     """Export project as markdown document"""
-    project = await db.projects.find_one({"id": project_id}, {"_id": 0})
+    projects = await db.projects.aggregate([
+        {"$match": {"_id": project_id}},
+        {"$project": {
+            "_id": 0,
+            "name": 1,
+            "created_at": 1,
+            "target_hardware": 1,
+            "status": 1,
+            "idea": 1,
+            "description": 1,
+            "stages": 1
+        }}
+    ]).to_list(1)
+    project = projects[0] if projects else None
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
@@ -1067,13 +1373,9 @@ async def export_project_markdown(project_id: str):
         ""
     ]
     
+    # Each section is appended as one pre-formatted block rather than a list of lines
     if project.get('description'):
-        md_lines.extend([
-            "## Description",
-            "",
-            project['description'],
-            ""
-        ])
+        md_lines.append(f"## Description\n\n{project['description']}\n")
     
     stage_titles = {
         "idea": "Idea",
@@ -1089,20 +1391,9 @@ async def export_project_markdown(project_id: str):
     for stage_key, title in stage_titles.items():
         stage_data = stages.get(stage_key, {})
         if stage_data.get('content') and stage_key != 'idea':
-            md_lines.extend([
-                "---",
-                "",
-                f"## {title}",
-                "",
-                stage_data['content'],
-                ""
-            ])
+            md_lines.append(f"---\n\n## {title}\n\n{stage_data['content']}\n")
             if stage_data.get('notes'):
-                md_lines.extend([
-                    "**Notes:**",
-                    stage_data['notes'],
-                    ""
-                ])
+                md_lines.append(f"**Notes:**\n{stage_data['notes']}\n")
     
     markdown_content = "\n".join(md_lines)
     
@@ -1117,12 +1408,15 @@ async def export_project_markdown(project_id: str):
 @api_router.get("/projects/{project_id}/export/json")
 async def export_project_json(project_id: str):
     """Export project as JSON"""
-    project = await db.projects.find_one({"id": project_id}, {"_id": 0})
+    project = doc_to_project(await db.projects.find_one({"_id": project_id}))
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
+    # Stored documents omit unset fields; the model restores them so the export stays complete
+    export = Project(**project).model_dump(mode="json")
+    
     return Response(
-        content=json.dumps(project, indent=2),
+        content=orjson.dumps(export, option=orjson.OPT_INDENT_2),
         media_type="application/json",
         headers={
             "Content-Disposition": f'attachment; filename="{project["name"].replace(" ", "_")}_export.json"'
@@ -1133,11 +1427,7 @@ async def export_project_json(project_id: str):
 
 def generate_ascii_wiring_diagram(component_ids: List[str]) -> dict:
     """Generate deterministic ASCII wiring diagram for selected components"""
-    all_components = []
-    for category in HARDWARE_LIBRARY.values():
-        all_components.extend(category)
-    
-    selected = [c for c in all_components if c["id"] in component_ids]
+    selected = [c for c in COMPONENTS_BY_ID.values() if c["id"] in component_ids]
     
     if not selected:
         return {"diagram": "No components selected", "warnings": [], "pin_assignments": {}}
@@ -1330,8 +1620,7 @@ async def instantiate_template(template_id: str):
         user_approved=True
     )
     
-    doc = project.model_dump()
-    await db.projects.insert_one(doc)
+    await db.projects.insert_one(project_to_doc(project))
     return project
 
 # ================== DEBUG ASSISTANCE ==================
@@ -1339,9 +1628,11 @@ async def instantiate_template(template_id: str):
 @api_router.post("/debug")
 async def debug_assistance(request: DebugRequest):
     """Analyze error logs and provide debugging assistance"""
-    project = await db.projects.find_one({"id": request.project_id}, {"_id": 0})
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    # Fetch the project while the system prompt is selected
+    project_task = asyncio.ensure_future(db.projects.find_one(
+        {"_id": request.project_id},
+        {"_id": 0, "name": 1, "idea": 1, "target_hardware": 1, "stages.code": 1, "stages.hardware": 1}
+    ))
     
     error_type_prompts = {
         "compilation": """You are an ESP32/Arduino compilation error expert. Analyze the following compiler error and provide:
@@ -1419,6 +1710,10 @@ Focus on practical, hands-on debugging.""",
     
     system_prompt = error_type_prompts.get(request.error_type, error_type_prompts["runtime"])
     
+    project = await project_task
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
     # Build context
     context_parts = [
         f"Project: {project['name']}",
@@ -1456,20 +1751,31 @@ Please analyze this {request.error_type} issue and provide debugging assistance.
     ]
     
     try:
-        # Route to appropriate provider
+        # Resolve provider defaults first so the cache key reflects the actual model
         if request.provider == LLMProvider.GROQ:
             if not request.api_key:
                 raise HTTPException(status_code=400, detail="Groq API key required")
             model = request.model or "llama-3.1-70b-versatile"
-            response = await call_groq_api(messages, model, request.api_key)
         elif request.provider == LLMProvider.OPENROUTER:
             if not request.api_key:
                 raise HTTPException(status_code=400, detail="OpenRouter API key required")
             model = request.model or "anthropic/claude-3.5-sonnet"
-            response = await call_openrouter_api(messages, model, request.api_key)
         else:
             model = request.model or "gpt-4o"
-            response = await call_emergent_api(messages, model)
+        
+        cache_key = llm_cache_key(request.provider, model, messages)
+        response = await get_cached_llm_response(cache_key) if request.use_cache else None
+        
+        if response is None:
+            # Route to appropriate provider
+            if request.provider == LLMProvider.GROQ:
+                response = await call_groq_api(messages, model, request.api_key)
+            elif request.provider == LLMProvider.OPENROUTER:
+                response = await call_openrouter_api(messages, model, request.api_key)
+            else:
+                response = await call_emergent_api(messages, model)
+            if request.use_cache:
+                await set_cached_llm_response(cache_key, response)
         
         return {
             "analysis": response,
@@ -1492,6 +1798,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup_db_client():
+    # Open the connection pool before the first request arrives
+    await db.command("ping")
+    await migrate_project_ids()
+    
+    # Index builds are independent, so issue them concurrently
+    index_builds = [
+        db.projects.create_index([("updated_at", -1)]),
+        db.projects.create_index([("status", 1), ("updated_at", -1)])
+    ]
+    if LLM_CACHE_TTL_SECONDS > 0:
+        index_builds.append(db.llm_cache.create_index("created_at", expireAfterSeconds=LLM_CACHE_TTL_SECONDS))
+    await asyncio.gather(*index_builds)
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
+    await LLM_HTTP.aclose()